@@ -1,6 +1,6 @@
-from itertools import combinations
 import random
-import copy
+from collections import deque
+from itertools import product
 
 
 class Minesweeper():
@@ -15,21 +15,22 @@ class Minesweeper():
         self.width = width
         self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        # Initialize an empty field with no mines, stored row by row
+        self.board = bytearray(height * width)
 
         # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        for idx in random.sample(range(height * width), mines):
+            i, j = divmod(idx, width)
+            self.mines.add((i, j))
+            self.board[idx] = True
+
+        # Count once the mines around every cell, by adding each mine to its neighbours
+        self.counts = bytearray(height * width)
+        for (mi, mj) in self.mines:
+            for i, j in product(range(max(mi - 1, 0), min(mi + 2, height)),
+                                range(max(mj - 1, 0), min(mj + 2, width))):
+                if (i, j) != (mi, mj):
+                    self.counts[i * width + j] += 1
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -42,7 +43,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board[i * self.width + j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -51,7 +52,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i * self.width + j])
 
     def nearby_mines(self, cell):
         """
@@ -60,23 +61,8 @@ class Minesweeper():
         not including the cell itself.
         """
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return self.counts[i * self.width + j]
 
     def won(self):
         """
@@ -93,11 +79,16 @@ class Sentence():
     """
 
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = frozenset(cells)
         self.count = count
+        self._hash = hash((self.cells, count))
 
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        return (self._hash == other._hash
+                and self.cells == other.cells and self.count == other.count)
+
+    def __hash__(self):
+        return self._hash
 
     def __str__(self):
         return f"{self.cells} = {self.count}"
@@ -120,24 +111,40 @@ class Sentence():
 
     def mark_mine(self, cell):
         """
-        Updates internal knowledge representation given the fact that
+        Returns the sentence updated with the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            trans = copy.deepcopy(self.cells)
-            trans.discard(cell)
-            self.cells = trans
-            self.count -= 1
+        if cell not in self.cells:
+            return self
+        return Sentence(self.cells - {cell}, self.count - 1)
 
     def mark_safe(self, cell):
         """
-        Updates internal knowledge representation given the fact that
+        Returns the sentence updated with the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            trans = copy.deepcopy(self.cells)
-            trans.discard(cell)
-            self.cells = trans
+        if cell not in self.cells:
+            return self
+        return Sentence(self.cells - {cell}, self.count)
+
+    def mark_mines(self, cells):
+        """
+        Returns the sentence updated with the fact that
+        all of the given cells are known to be mines.
+        """
+        overlap = self.cells & cells
+        if not overlap:
+            return self
+        return Sentence(self.cells - overlap, self.count - len(overlap))
+
+    def mark_safes(self, cells):
+        """
+        Returns the sentence updated with the fact that
+        all of the given cells are known to be safe.
+        """
+        if self.cells.isdisjoint(cells):
+            return self
+        return Sentence(self.cells - cells, self.count)
 
 
 class MinesweeperAI():
@@ -161,15 +168,50 @@ class MinesweeperAI():
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Whether each sentence in knowledge is still unsolved, kept at the same index
+        self._kb_alive = []
+
+        # Cells bitmask of each sentence in knowledge, kept at the same index
+        self._kb_masks = []
+
+        # Sentences in knowledge, for constant time duplicate checks
+        self._knowledge_sigs = set()
+
+        # Number of solved sentences still left in knowledge
+        self._tombstones = 0
+
+        # Sentences added or changed since the last inference pass
+        self._dirty_sentences = set()
+
+        # Sentences solved by the latest marks, waiting for their cells to be marked
+        self._pending = deque()
+
         # A change marker to knowledge
         self.KB_has_changed = False
 
-        # the empty sentence
-        self.empty = Sentence(set(), 0)
-
         # the list of all possible moves on the grid
         self.all_possible_moves = self.all_possible_moves()
 
+        # the neighbours of every cell on the grid, computed once
+        self._neighbors = {
+            c: frozenset((i, j)
+                         for i, j in product(range(c[0] - 1, c[0] + 2),
+                                             range(c[1] - 1, c[1] + 2))
+                         if (i, j) != c and 0 <= i < self.height and 0 <= j < self.width)
+            for c in self.all_possible_moves
+        }
+
+        # a distinct bit for every cell on the grid, at its integer index
+        self._bits = {c: 1 << self.encode(c) for c in self.all_possible_moves}
+
+        # known safes not played yet, kept up to date as cells get marked
+        self._safe_unmade = set()
+
+        # cells neither played nor known mines, as a list to pick from at
+        # random and the position of each cell in it
+        self._available = list(self.all_possible_moves)
+        self._available_index = {c: i for i, c in enumerate(self._available)}
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
@@ -177,24 +219,21 @@ class MinesweeperAI():
         """
         if cell not in self.mines:
             self.mines.add(cell)
+            self.discard_move(cell)
             self.KB_has_changed = True
-            for s in self.knowledge:
-                Sentence.mark_mine(s, cell)
-        else:
-             self.KB_has_changed = False
+            self.triage(lambda s: s.mark_mine(cell))
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        if cell not in self.mines:
+        if cell not in self.mines and cell not in self.safes:
             self.safes.add(cell)
+            if cell not in self.moves_made:
+                self._safe_unmade.add(cell)
             self.KB_has_changed = True
-            for s in self.knowledge:
-                Sentence.mark_safe(s, cell)
-        else:
-             self.KB_has_changed = False
+            self.triage(lambda s: s.mark_safe(cell))
 
     def add_knowledge(self, cell, count):
         """
@@ -202,16 +241,18 @@ class MinesweeperAI():
         safe cell, how many neighboring cells have mines in them.
         """
         """
-        1) mark the cell as a move that has been made
+        0) take in any sentence added to knowledge from outside the AI
         """
-        self.moves_made.add(cell)
+        self.adopt_knowledge()
 
         """
-        2) mark the cell as safe
+        1) mark the cell as a move that has been made
         """
-        self.mark_safe(cell)
+        self.moves_made.add(cell)
+        self.discard_move(cell)
 
-        """ 
+        """
+        2) mark the cell as safe, in the same pass over knowledge as
         3) add a new sentence to the AI's knowledge base
            based on the value of `cell` and `count`
            From spex: only include neigbouring'cells whose state 
@@ -249,7 +290,10 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        safe_moves = self.safes - self.moves_made
+        for move in self._safe_unmade:
+            return move
+        # safes may also have been added to self.safes from outside the AI
+        safe_moves = self.safes - self.moves_made - self.mines
         if len(safe_moves) > 0:
             return safe_moves.pop()
         else:
@@ -262,10 +306,15 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        random_move = self.all_possible_moves - self.moves_made - self.mines
+        if self._available:
+            move = random.choice(self._available)
+            if move not in self.moves_made and move not in self.mines:
+                return move
+        # the sets were changed from outside the AI, pick from a full scan
+        random_move = list(self.all_possible_moves - self.moves_made - self.mines)
 
         if len(random_move) > 0:
-            return random_move.pop()
+            return random.choice(random_move)
         else:
             return None
 
@@ -288,31 +337,45 @@ class MinesweeperAI():
         neighbors = self.neighbors(cell)
 
         # creates a new sentence by removing known safes and mines
-        # marks potential new found mines and safes, and updates knowledge base
-        sentence = self.clean_up(neighbors, count)
+        sentence, new_mines, new_safes = self.clean_up(neighbors, count)
 
         # add sentence to knowledge only if sentence is not none and not already known
-        if sentence:
-            self.add_if_new(sentence)
+        self.add_if_new(sentence)
+
+        # updates knowledge base with the cell itself and all new found mines and safes at once
+        self.mark_cells(new_mines, new_safes | {cell})
 
     """
     3b) Adds new sentence to knowledge if not empty or already there
     """
 
     def add_if_new(self, sentence):
-        if len(self.knowledge) == 0:
-            self.KB_has_changed = True
-            self.knowledge.append(sentence)
-        elif not self.in_knowledge(sentence):
+        if sentence is None:
+            return
+        if sentence not in self._knowledge_sigs:
+            self._knowledge_sigs.add(sentence)
+            self._dirty_sentences.add(sentence)
             self.KB_has_changed = True
             self.knowledge.append(sentence)
+            self._kb_alive.append(True)
+            self._kb_masks.append(self.mask(sentence.cells))
 
     """
-    3c) Append sentence to knowledge if not already present
+    3c) Queues or flags sentences appended to knowledge from outside the AI,
+    so that they are not skipped by the marking and inference passes
     """
 
-    def in_knowledge(self, sentence):
-        return any(list(filter(lambda s: sentence.__eq__(s), self.knowledge)))
+    def adopt_knowledge(self):
+        for s in self.knowledge[len(self._kb_alive):]:
+            solved = s.count == 0 or len(s.cells) == s.count
+            self._kb_alive.append(not solved)
+            self._kb_masks.append(self.mask(s.cells))
+            if solved:
+                self._tombstones += 1
+                self._pending.append(s)
+            elif s not in self._knowledge_sigs:
+                self._knowledge_sigs.add(s)
+                self._dirty_sentences.add(s)
 
     """
     ---------------------------------------------
@@ -321,15 +384,20 @@ class MinesweeperAI():
     """
 
     def mark_additional_cells(self):
-        for s in self.knowledge:
-            new_mines = Sentence.known_mines(s)
-            new_safes = Sentence.known_safes(s)
-            if new_mines:
-                self.KB_has_changed = True
-                self.mark_mines(new_mines)
-            elif new_safes:  # and new safes
-                self.KB_has_changed = True
-                self.mark_safes(new_safes)
+        # only sentences solved by previous marks can yield new mines or safes
+        while self._pending:
+            # collect every conclusion first, then update knowledge in one pass
+            new_mines = set()
+            new_safes = set()
+            while self._pending:
+                s = self._pending.popleft()
+                mines = Sentence.known_mines(s)
+                safes = Sentence.known_safes(s)
+                if mines:
+                    new_mines |= mines
+                elif safes:
+                    new_safes |= safes
+            self.mark_cells(new_mines, new_safes)
 
     """
     ----------------------------
@@ -338,18 +406,76 @@ class MinesweeperAI():
     """
 
     def mark_safes(self, new_safes):
-        for a in new_safes:
-            if a not in self.safes:
-                self.mark_safe(a)
+        self.mark_cells(set(), new_safes)
 
     """
     4c) Marks all cells as mines
     """
 
     def mark_mines(self, new_mines):
-        for m in new_mines:
-            if m not in self.mines:  # we found new unlisted mines
-                self.mark_mine(m)
+        self.mark_cells(new_mines, set())
+
+    """
+    4d) Marks cells as mines and safes with a single update of each sentence
+    """
+
+    def mark_cells(self, new_mines, new_safes):
+        new_mines = set(new_mines) - self.mines  # we found new unlisted mines
+        new_safes = set(new_safes) - self.safes - self.mines - new_mines
+        if new_mines or new_safes:
+            self.mines |= new_mines
+            self.safes |= new_safes
+            for mine in new_mines:
+                self.discard_move(mine)
+            self._safe_unmade |= new_safes - self.moves_made
+            self.KB_has_changed = True
+            self.triage(lambda s: s.mark_mines(new_mines).mark_safes(new_safes))
+
+    """
+    4e) Applies a mark to knowledge in place, keeps unsolved sentences and
+    queues the solved ones, left as dead slots, to have their cells marked
+    """
+
+    def triage(self, mark):
+        self.adopt_knowledge()
+        for i, s in enumerate(self.knowledge):
+            if not self._kb_alive[i]:
+                continue
+            new = mark(s)
+            if new is s:
+                continue
+            self.knowledge[i] = new
+            self._kb_masks[i] = self.mask(new.cells)
+            if new.count == 0 or len(new.cells) == new.count:
+                self._kb_alive[i] = False
+                self._tombstones += 1
+                self._pending.append(new)
+            # a sentence narrowed by the mark is new to the inference pass
+            elif new not in self._knowledge_sigs:
+                self._knowledge_sigs.add(new)
+                self._dirty_sentences.add(new)
+
+        # only drop dead slots once they make up most of knowledge
+        if self._tombstones > len(self.knowledge) // 2:
+            live = [i for i, alive in enumerate(self._kb_alive) if alive]
+            self.knowledge[:] = [self.knowledge[i] for i in live]
+            self._kb_masks = [self._kb_masks[i] for i in live]
+            self._kb_alive = [True] * len(live)
+            self._knowledge_sigs = set(self.knowledge)
+            self._tombstones = 0
+
+    """
+    4f) Takes a played cell or a mine out of the moves left to make
+    """
+
+    def discard_move(self, cell):
+        self._safe_unmade.discard(cell)
+        i = self._available_index.pop(cell, None)
+        if i is not None:
+            last = self._available.pop()
+            if last != cell:  # move the last cell into the freed position
+                self._available[i] = last
+                self._available_index[last] = i
 
     """
     -----------------------------------------------------------------------
@@ -358,36 +484,37 @@ class MinesweeperAI():
     """
 
     def add_inferred_sentence(self):
-        pairs = self.unique_pairs()
-        if pairs:
-            for (s1, s2) in pairs:
-                # adds knowledfge if s1 is a proper subset of s2
-                if s1.cells < s2.cells:
+        self.adopt_knowledge()
+        # pairs of sentences left untouched since the last pass have already been tried
+        dirty = self._dirty_sentences
+        self._dirty_sentences = set()
+        if not dirty:
+            return
+        # non empty sentences ordered by size, so only s1 can be a proper subset of s2
+        order = sorted((i for i, s in enumerate(self.knowledge)
+                        if self._kb_alive[i] and s.cells),
+                       key=lambda i: len(self.knowledge[i].cells))
+        # snapshot, as inferring may mark cells and update knowledge in place
+        sorted_k = [self.knowledge[i] for i in order]
+        # one bit per cell, so that inclusion is a single integer test
+        masks = [self._kb_masks[i] for i in order]
+        fresh = [j for j, s in enumerate(sorted_k) if s in dirty]
+        for i, s1 in enumerate(sorted_k):
+            a = masks[i]
+            if s1 in dirty:
+                others = range(i + 1, len(sorted_k))
+            else:
+                others = (j for j in fresh if j > i)
+            for j in others:
+                b = masks[j]
+                # adds knowledge if s1 is a proper subset of s2
+                if a != b and a & b == a:
+                    s2 = sorted_k[j]
                     cells = s2.cells - s1.cells
                     count = s2.count - s1.count
-                    # sent1 = Sentence(cells, count)
-                    sent1 = self.clean_up(cells, count)
-                    # self.KB_has_changed = True
-                    self.add_if_new(sent1)
-                # or vice versa
-                elif s2.cells < s1.cells:
-                    cells = s1.cells - s2.cells
-                    count = s1.count - s2.count
-                    # sent2 = Sentence(cells, count)
-                    sent2 = self.clean_up(cells, count)
-                    # self.KB_has_changed = True
-                    self.add_if_new(sent2)
-
-    """
-    ----------------------------------------------
-    5b) finds unique pairs of sentences amongst KB
-    ----------------------------------------------
-    """
-
-    def unique_pairs(self):
-        return [(s1, s2) for s1, s2
-                in combinations(filter(lambda s: self.is_not_empty(s), self.knowledge), 2)
-                if not self.are_identicals(s1, s2)]
+                    sentence, new_mines, new_safes = self.clean_up(cells, count)
+                    self.add_if_new(sentence)
+                    self.mark_cells(new_mines, new_safes)
 
     """
     ==============================
@@ -395,58 +522,40 @@ class MinesweeperAI():
     ==============================
     """
     
-    def are_identicals(self, s1, s2):
-        return s1.__eq__(s2)
-
-    def is_not_empty(self, s):
-        return not s.__eq__(self.empty)
-
     def neighbors(self, cell):
-        neighbors = set()
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+        return self._neighbors[cell]
 
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
+    def mask(self, cells):
+        mask = 0
+        for c in cells:
+            mask |= self._bits[c]
+        return mask
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    neighbors.add((i, j))
-        return neighbors
+    def encode(self, cell):
+        return cell[0] * self.width + cell[1]
 
 
     """
-    return sentence only including cells whose state is still undetermined
+    return (sentence, new mines, new safes): the sentence only including cells
+    whose state is still undetermined, or None with the cells it settles
     """
 
     def clean_up(self, cells, count):
         # Remove known safes and mines
-        trans_cells = copy.deepcopy(cells)
-        for c in cells:
-            if c in self.safes:
-                trans_cells.discard(c)
-            elif c in self.mines:
-                trans_cells.discard(c)
-                count -= 1
-        # search for new safes and mines
-        # update sets and knowledge
+        trans_cells = set(cells) - self.safes
+        overlap_mines = trans_cells & self.mines
+        trans_cells -= overlap_mines
+        count -= len(overlap_mines)
+        # search for new safes and mines, left to the caller to mark
         if trans_cells:
             if count == 0:
-                self.mark_safes(trans_cells)
-                return None
+                return None, set(), trans_cells
             elif len(trans_cells) == count:
-                self.mark_mines(trans_cells)
-                return None
+                return None, trans_cells, set()
             else:
-                return Sentence(trans_cells, count)
-        return None
+                return Sentence(trans_cells, count), set(), set()
+        return None, set(), set()
 
    
     def all_possible_moves(self):
-        all_moves = set()
-        for i in range(self.height):
-            for j in range(self.width):
-                all_moves.add((i, j))
-        return all_moves
+        return {(i, j) for i, j in product(range(self.height), range(self.width))}
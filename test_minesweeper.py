@@ -0,0 +1,141 @@
+import random
+import unittest
+
+from minesweeper import Minesweeper, MinesweeperAI, Sentence
+
+
+class TestNearbyMines(unittest.TestCase):
+
+    def brute_force(self, game, cell):
+        return sum(1 for i in range(cell[0] - 1, cell[0] + 2)
+                   for j in range(cell[1] - 1, cell[1] + 2)
+                   if (i, j) != cell
+                   and 0 <= i < game.height and 0 <= j < game.width
+                   and game.is_mine((i, j)))
+
+    def test_counts_match_brute_force(self):
+        random.seed(0)
+        for height, width, mines in [(1, 1, 0), (1, 5, 2), (4, 7, 10), (8, 8, 8), (8, 8, 63)]:
+            game = Minesweeper(height, width, mines)
+            for i in range(height):
+                for j in range(width):
+                    self.assertEqual(game.nearby_mines((i, j)),
+                                     self.brute_force(game, (i, j)), (height, width, i, j))
+
+    def test_corner_and_edge_cells(self):
+        game = Minesweeper(3, 4, 12)
+        self.assertEqual(game.nearby_mines((0, 0)), 3)
+        self.assertEqual(game.nearby_mines((2, 3)), 3)
+        self.assertEqual(game.nearby_mines((0, 1)), 5)
+        self.assertEqual(game.nearby_mines((1, 0)), 5)
+        self.assertEqual(game.nearby_mines((1, 2)), 8)
+
+
+class TestKnowledgeChangeFlag(unittest.TestCase):
+
+    def test_marking_known_mine_keeps_a_pending_change(self):
+        # add_knowledge keeps inferring for as long as KB_has_changed is set
+        ai = MinesweeperAI(height=3, width=3)
+        ai.mark_mine((0, 0))
+        self.assertTrue(ai.KB_has_changed)
+        ai.mark_mine((0, 0))
+        ai.mark_safe((0, 0))
+        self.assertTrue(ai.KB_has_changed)
+
+    def test_marking_known_safe_keeps_a_pending_change(self):
+        ai = MinesweeperAI(height=3, width=3)
+        ai.mark_safe((1, 1))
+        ai.mark_safe((1, 1))
+        self.assertTrue(ai.KB_has_changed)
+
+
+class TestMarkAdditionalCells(unittest.TestCase):
+
+    def setUp(self):
+        # a single row, so playing (0, 1) gives {(0, 0), (0, 2)} = count
+        self.ai = MinesweeperAI(height=1, width=3)
+
+    def test_sentence_solved_by_safe_mark_marks_its_mines(self):
+        self.ai.add_knowledge((0, 1), 1)
+        self.ai.mark_safe((0, 0))
+        self.ai.mark_additional_cells()
+        self.assertIn((0, 2), self.ai.mines)
+
+    def test_sentence_solved_by_mine_mark_marks_its_safes(self):
+        self.ai.add_knowledge((0, 1), 1)
+        self.ai.mark_mine((0, 0))
+        self.ai.mark_additional_cells()
+        self.assertIn((0, 2), self.ai.safes)
+
+
+class TestAddInferredSentence(unittest.TestCase):
+
+    def setUp(self):
+        self.ai = MinesweeperAI(height=3, width=4)
+        # the 8 neighbours of (1, 1) hold 2 mines
+        self.ai.add_knowledge((1, 1), 2)
+        # {(0, 2), (0, 3), (1, 2), (2, 2), (2, 3)} = 1, not a subset of the above
+        self.ai.add_knowledge((1, 3), 1)
+
+    def test_narrowed_sentence_is_paired_with_untouched_one(self):
+        inferred = Sentence({(0, 0), (0, 1), (1, 0), (2, 0), (2, 1)}, 1)
+        self.assertNotIn(inferred, self.ai.knowledge)
+
+        # narrows the second sentence to a subset of the untouched first one
+        self.ai.mark_safe((0, 3))
+        self.ai.mark_safe((2, 3))
+        self.ai.mark_additional_cells()
+        self.ai.add_inferred_sentence()
+        self.assertIn(inferred, self.ai.knowledge)
+
+    def test_sentence_appended_to_knowledge_is_paired(self):
+        ai = MinesweeperAI(height=3, width=4)
+        ai.add_knowledge((1, 1), 2)
+        ai.mark_safe((0, 3))
+        ai.knowledge.append(Sentence({(0, 0), (0, 1)}, 1))
+        # plays a known safe, whose sentence touches neither of the above
+        ai.add_knowledge((0, 3), 1)
+        self.assertIn(Sentence({(0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)}, 1),
+                      ai.knowledge)
+
+
+class TestMakeMove(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        # the true mines of a 3x4 board, to answer each played cell
+        self.board_mines = {(0, 1), (2, 3)}
+        self.ai = MinesweeperAI(height=3, width=4)
+        self.ai.add_knowledge((0, 0), self.count((0, 0)))
+        self.ai.mark_mine((2, 3))
+        self.ai.mark_safe((1, 2))
+        self.ai.add_knowledge((2, 0), self.count((2, 0)))
+        self.ai.mark_safe((0, 3))
+        self.ai.add_knowledge((1, 2), self.count((1, 2)))
+        self.ai.mark_mine((0, 1))
+
+    def count(self, cell):
+        return len(self.ai.neighbors(cell) & self.board_mines)
+
+    def test_safe_move_is_an_unplayed_safe(self):
+        while True:
+            move = self.ai.make_safe_move()
+            if move is None:
+                break
+            self.assertIn(move, self.ai.safes)
+            self.assertNotIn(move, self.ai.moves_made)
+            self.assertNotIn(move, self.ai.mines)
+            self.ai.add_knowledge(move, self.count(move))
+        self.assertEqual(self.ai.safes - self.ai.moves_made - self.ai.mines, set())
+
+    def test_random_move_covers_unplayed_non_mines_only(self):
+        moves_made, mines = self.ai.moves_made.copy(), self.ai.mines.copy()
+        moves = {self.ai.make_random_move() for _ in range(200)}
+        self.assertEqual(moves, self.ai.all_possible_moves - moves_made - mines)
+        # picking a move leaves the AI as it was
+        self.assertEqual(self.ai.moves_made, moves_made)
+        self.assertEqual(self.ai.mines, mines)
+
+
+if __name__ == "__main__":
+    unittest.main()